@@ -8,89 +8,87 @@ Learning focus:
 - Error handling
 """
 
-import json
+import asyncio
+import functools
+import hashlib
 import os
+import re
+import time
+from collections import OrderedDict
+from itertools import islice
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
 
 import httpx
+import orjson
+from aiolimiter import AsyncLimiter
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field, field_validator
-
-# Load environment variables
-load_dotenv()
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 # ============================================================================
 # SECURITY: Credential Management
 # ============================================================================
-class APICredentials:
+@functools.lru_cache(maxsize=None)
+def get_serper_key() -> str:
     """
     Learning Point: Secure credential management
     - Load from environment variables (never hardcode)
     - Validate credentials exist before using
     - Handle missing credentials gracefully
+    - Resolved once per process; a missing key is not cached, so a later
+      call can still pick it up
     """
-    
-    def __init__(self):
-        self.serper_api_key = os.getenv("SERPER_API_KEY")
-        if not self.serper_api_key:
-            raise ValueError("SERPER_API_KEY environment variable not set")
-    
-    def get_serper_key(self) -> str:
-        """Return API key for Serper service"""
-        if not self.serper_api_key:
-            raise RuntimeError("Serper API key not initialized")
-        return self.serper_api_key
+    load_dotenv()
+    serper_api_key = os.environ.get("SERPER_API_KEY")
+    if not serper_api_key:
+        raise ValueError("SERPER_API_KEY environment variable not set")
+    return serper_api_key
 
 
 # ============================================================================
 # DATA MODELS: Input Validation & Sanitization
 # ============================================================================
+# Characters that could cause injection; removed once where product names
+# enter the system (ForecastParser.iter_products) rather than in a
+# per-instance validator. The models do not sanitize: anything else that
+# builds a Product or ProductSearchRequest from outside input must call
+# sanitize_name() first. Parentheses stay: product names carry them
+# ("TALSTAR PROFESSIONAL (BIFENTHRIN)"), and "$(" is defused by dropping "$"
+_DANGEROUS = str.maketrans('', '', '$`{}|&;<>')
+_DANGEROUS_RE = re.compile(r"[$`{}|&;<>]")
+
+
+def sanitize_name(value: str) -> str:
+    """
+    Learning Point: Input sanitization
+    - Strip whitespace
+    - Remove dangerous characters
+    - Clean names (the common case) only pay for one regex scan
+    """
+    if _DANGEROUS_RE.search(value) is not None:
+        value = value.translate(_DANGEROUS)
+    return value.strip()
+
+# Shared by all models: no type coercion, immutable (hashable) instances,
+# unknown fields rejected
+_MODEL_CONFIG = ConfigDict(strict=True, frozen=True, extra='forbid')
+
+
 class Product(BaseModel):
     """
     Learning Point: Pydantic for input validation
     - Type checking (name is string, volume is float)
-    - Value constraints (volume > 0)
-    - Custom validators for security
+    - Value constraints (volume > 0, month matches YYYY-MM)
+    - Constraints run inside pydantic-core, no Python validators
     """
     
+    model_config = _MODEL_CONFIG
+    
     name: str = Field(..., min_length=1, max_length=500)
     volume: float = Field(..., gt=0, lt=1000)  # Must be positive, reasonable limit
     unit: str = Field(..., min_length=1, max_length=20)
     targets: str = Field(default="", max_length=500)
-    month: str = Field(..., min_length=7, max_length=7)  # YYYY-MM format
-    
-    @field_validator('name')
-    @classmethod
-    def sanitize_name(cls, v: str) -> str:
-        """
-        Learning Point: Input sanitization
-        - Strip whitespace
-        - Remove dangerous characters
-        - Prevent prompt injection
-        """
-        v = v.strip()
-        # Remove special characters that could cause injection
-        dangerous_chars = ['$', '`', '$(', '{', '}', '|', '&', ';']
-        for char in dangerous_chars:
-            v = v.replace(char, '')
-        return v
-    
-    @field_validator('month')
-    @classmethod
-    def validate_month_format(cls, v: str) -> str:
-        """Validate month is in YYYY-MM format"""
-        if len(v) != 7 or v[4] != '-':
-            raise ValueError("Month must be in YYYY-MM format")
-        try:
-            year, month = v.split('-')
-            int(year)
-            int(month)
-            if not (1 <= int(month) <= 12):
-                raise ValueError("Month must be 01-12")
-        except ValueError as e:
-            raise ValueError(f"Invalid month format: {e}")
-        return v
+    month: str = Field(..., pattern=r"^\d{4}-(0[1-9]|1[0-2])$")  # YYYY-MM format
 
 
 class ForecastRequest(BaseModel):
@@ -100,6 +98,8 @@ class ForecastRequest(BaseModel):
     - Set reasonable limits to prevent DoS
     """
     
+    model_config = _MODEL_CONFIG
+    
     forecast_file: str = Field(..., max_length=1000)  # Prevent path traversal
     limit_products: int = Field(default=10, ge=1, le=100)  # Rate limiting
     
@@ -120,25 +120,27 @@ class ForecastRequest(BaseModel):
 
 class ProductSearchRequest(BaseModel):
     """Request for searching a product"""
+    model_config = _MODEL_CONFIG
+    
     product_name: str = Field(..., min_length=1, max_length=500)
     quantity: float = Field(..., gt=0, lt=1000)
     unit: str = Field(..., min_length=1, max_length=20)
-    
-    @field_validator('product_name')
-    @classmethod
-    def sanitize_product_name(cls, v: str) -> str:
-        """Sanitize product name to prevent API abuse"""
-        v = v.strip()
-        # Remove injection characters
-        dangerous_chars = ['$', '`', '$(', '{', '}', '|', '&', ';', '<', '>']
-        for char in dangerous_chars:
-            v = v.replace(char, '')
-        return v
 
 
 # ============================================================================
 # CORE LOGIC
 # ============================================================================
+def _month_str_for(month_key: str) -> str | None:
+    """Map a forecast key like "Month_1" to "2025-01", or None if invalid"""
+    parts = month_key.split('_')
+    if len(parts) < 2 or not parts[1].isdigit():
+        return None
+    month_num = int(parts[1])
+    if not 1 <= month_num <= 12:
+        return None
+    return f"2025-{month_num:02d}"
+
+
 class ForecastParser:
     """
     Learning Point: Reading and parsing external data
@@ -149,6 +151,9 @@ class ForecastParser:
     
     def __init__(self, base_dir: str = "."):
         self.base_dir = Path(base_dir)
+        self._resolved_base = self.base_dir.resolve(strict=False)
+        # LAWN_AI_STRICT=1 runs full pydantic validation on every product
+        self.strict = os.getenv("LAWN_AI_STRICT") == "1"
     
     def read_forecast(self, forecast_file: str) -> dict:
         """
@@ -157,29 +162,28 @@ class ForecastParser:
         Learning: Safe file operations with error handling
         """
         try:
-            file_path = self.base_dir / forecast_file
+            file_path = self._resolved_base / forecast_file
             
-            # Resolve to absolute path
+            # Always resolve: a symlinked directory anywhere in the path can
+            # point outside the base. Only the base's resolution is cached.
             resolved_file = file_path.resolve()
-            resolved_base = self.base_dir.resolve()
             
             # Security: Check file exists first
             if not resolved_file.exists():
                 raise FileNotFoundError(f"Forecast file not found: {file_path}")
             
             # Check if resolved file is under base directory (prevent traversal outside)
-            try:
-                resolved_file.relative_to(resolved_base)
-            except ValueError:
+            resolved_base = str(self._resolved_base)
+            if os.path.commonpath([str(resolved_file), resolved_base]) != resolved_base:
                 raise ValueError("Path traversal attempt detected")
             
-            with open(resolved_file, 'r') as f:
-                data = json.load(f)
+            with open(resolved_file, 'rb') as f:
+                data = orjson.loads(f.read())
             
             return data
         except FileNotFoundError as e:
             raise ValueError(f"Cannot read forecast: {e}")
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             raise ValueError(f"Invalid JSON in forecast file: {e}")
     
     def extract_products(self, forecast: dict, limit: int = 10) -> list[Product]:
@@ -188,47 +192,55 @@ class ForecastParser:
         
         Learning: Robust parsing with validation
         - Handle missing fields gracefully
-        - Validate each product
+        - Validate each product (cheap inline checks for our own data)
         - Apply limits to prevent memory issues
         """
-        products = []
-        count = 0
+        return list(islice(self.iter_products(forecast), limit))
+    
+    def iter_products(self, forecast: dict) -> Iterator[Product]:
+        """
+        Yield valid products from forecast one at a time
         
+        Lazy, so a caller capping the count with islice never looks at
+        months past the limit.
+        """
         for month_key, month_data in forecast.items():
-            if count >= limit:
-                break
-            
-            # Extract month from key (e.g., "Month_1" -> "2025-01")
-            try:
-                month_num = int(month_key.split('_')[1])
-                month_str = f"2025-{month_num:02d}"
-            except (ValueError, IndexError):
+            month_str = _month_str_for(month_key)
+            if month_str is None:
                 # Skip invalid month keys
                 continue
             
             # Extract products from this month
             month_products = month_data.get('products', {})
             for product_name, product_data in month_products.items():
-                if count >= limit:
-                    break
-                
                 try:
-                    # Validate and create product
-                    product = Product(
-                        name=product_name,
-                        volume=float(product_data.get('volume', 0)),
-                        unit=product_data.get('unit', 'oz'),
-                        targets=product_data.get('targets', ''),
-                        month=month_str
-                    )
-                    products.append(product)
-                    count += 1
+                    # Sanitize name, then validate and create product
+                    name = sanitize_name(product_name)
+                    volume = float(product_data.get('volume', 0) or 0)
+                    fields = {
+                        "name": name,
+                        "volume": volume,
+                        "unit": product_data.get('unit', 'oz'),
+                        "targets": product_data.get('targets', ''),
+                        "month": month_str,
+                    }
+                    if self.strict:
+                        # Straight to the class's compiled validator
+                        product = Product.model_validate(fields)
+                    else:
+                        # Forecast file is our own output: check the fields
+                        # that can actually go wrong and skip full validation
+                        if not name or len(name) > 500:
+                            raise ValueError("Invalid product name")
+                        if not 0 < volume < 1000:
+                            raise ValueError(f"Volume out of range: {volume}")
+                        product = Product.model_construct(**fields)
                 except Exception as e:
                     # Log but don't crash on invalid product
                     print(f"Warning: Could not parse product '{product_name}': {e}")
                     continue
-        
-        return products
+                
+                yield product
 
 
 class ProductSearcher:
@@ -238,15 +250,78 @@ class ProductSearcher:
     - Handle API errors gracefully
     - Rate limiting
     - Response validation
+    - Caching repeated searches
     """
     
-    def __init__(self, credentials: APICredentials):
-        self.credentials = credentials
-        self.client = httpx.AsyncClient(timeout=30.0)
-        self.request_count = 0
-        self.max_requests_per_minute = 60  # Rate limiting
+    def __init__(self, api_key: str, cache_dir: Path | None = None):
+        # One pooled HTTP/2 client: concurrent searches share a connection
+        # and auth headers are set once instead of per request
+        self.client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=20,
+                max_keepalive_connections=20,
+                keepalive_expiry=60.0
+            ),
+            headers={
+                "X-API-KEY": api_key,
+                "Content-Type": "application/json"
+            }
+        )
+        # Raw API responses persisted between runs (disabled when None)
+        self.cache_dir = cache_dir
+        self.cache_ttl_seconds = 24 * 60 * 60
+        # Rate limiting: at most 60 requests in any rolling 60s window;
+        # callers over the limit wait for capacity instead of failing
+        self.limiter = AsyncLimiter(60, 60)
+        # Formatted results by (product, unit); least recently used evicted
+        self._cache: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self.max_cache_entries = 1024
+        # Searches in flight, so concurrent duplicates share one API call
+        self._pending: dict[tuple[str, str], asyncio.Task] = {}
     
     async def search_product(self, search_request: ProductSearchRequest) -> dict:
+        """
+        Search for product, reusing earlier results for the same product
+        
+        Learning: Memoization
+        - A forecast repeats products across months; each costs one API call
+        - Concurrent duplicates wait on the same in-flight search
+        """
+        key = (search_request.product_name.lower(), search_request.unit.lower())
+        
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+        else:
+            task = self._pending.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._search_and_cache(key, search_request))
+                self._pending[key] = task
+            cached = await asyncio.shield(task)
+        
+        # Keys are case-insensitive; the record describes this request
+        return {
+            **cached,
+            "product": search_request.product_name,
+            "quantity": search_request.quantity,
+            "unit": search_request.unit
+        }
+    
+    async def _search_and_cache(self, key: tuple[str, str], search_request: ProductSearchRequest) -> dict:
+        """Run one API search and remember its result"""
+        try:
+            result = await self._search_api(search_request)
+        finally:
+            del self._pending[key]
+        
+        self._cache[key] = result
+        if len(self._cache) > self.max_cache_entries:
+            self._cache.popitem(last=False)
+        return result
+    
+    async def _search_api(self, search_request: ProductSearchRequest) -> dict:
         """
         Search for product using Serper API
         
@@ -255,36 +330,31 @@ class ProductSearcher:
         - Handle rate limiting
         - Validate responses
         - Graceful error handling
+        - Serve fresh disk cache first, stale cache if the network fails
         """
+        # Construct search query
+        query = f"{search_request.product_name} {search_request.unit} lawn care"
+        
+        cache_file = self._cache_file(query)
+        data = self._read_disk_cache(cache_file, max_age=self.cache_ttl_seconds)
+        if data is not None:
+            return self._format_results(data, search_request)
+        
         try:
-            # Rate limiting check
-            if self.request_count >= self.max_requests_per_minute:
-                raise RuntimeError("Rate limit exceeded - too many requests")
-            
-            # Prepare request
-            headers = {
-                "X-API-KEY": self.credentials.get_serper_key(),
-                "Content-Type": "application/json"
-            }
-            
-            # Construct search query
-            query = f"{search_request.product_name} {search_request.unit} lawn care"
-            
-            payload = {
+            # Prepare request (auth and JSON content-type headers are client
+            # defaults); serialize with orjson and send the bytes as-is
+            payload = orjson.dumps({
                 "q": query,
                 "num": 5,  # Limit results
                 "gl": "us"  # Geo-target
-            }
-            
-            # Make API call
-            response = await self.client.post(
-                "https://google.serper.dev/search",
-                json=payload,
-                headers=headers
-            )
+            })
             
-            # Increment counter for rate limiting
-            self.request_count += 1
+            # Make API call once the rate limiter has capacity
+            async with self.limiter:
+                response = await self.client.post(
+                    "https://google.serper.dev/search",
+                    content=payload
+                )
             
             # Validate response
             if response.status_code == 401:
@@ -299,13 +369,47 @@ class ProductSearcher:
             # Validate response structure
             if not isinstance(data, dict):
                 raise ValueError("Invalid API response format")
-            
-            return self._format_results(data, search_request)
         
-        except httpx.TimeoutException:
-            raise RuntimeError("API request timeout")
         except httpx.RequestError as e:
-            raise RuntimeError(f"API request failed: {e}")
+            # Network failure: a stale cached response beats no response
+            data = self._read_disk_cache(cache_file)
+            if data is None:
+                if isinstance(e, httpx.TimeoutException):
+                    raise RuntimeError("API request timeout")
+                raise RuntimeError(f"API request failed: {e}")
+            return self._format_results(data, search_request)
+        
+        self._write_disk_cache(cache_file, data)
+        return self._format_results(data, search_request)
+    
+    def _cache_file(self, query: str) -> Path | None:
+        """Cache location for a query, named by its hash"""
+        if self.cache_dir is None:
+            return None
+        digest = hashlib.sha256(query.encode()).hexdigest()
+        return self.cache_dir / f"{digest}.json"
+    
+    def _read_disk_cache(self, cache_file: Path | None, max_age: float | None = None) -> dict | None:
+        """Return a cached API response, or None if missing, too old or corrupt"""
+        if cache_file is None:
+            return None
+        try:
+            if max_age is not None and time.time() - cache_file.stat().st_mtime >= max_age:
+                return None
+            data = orjson.loads(cache_file.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+        return data if isinstance(data, dict) else None
+    
+    def _write_disk_cache(self, cache_file: Path | None, data: dict) -> None:
+        """Persist an API response; caching is best effort"""
+        if cache_file is None:
+            return
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            cache_file.write_bytes(orjson.dumps(data))
+        except OSError as e:
+            print(f"Warning: Could not write search cache: {e}")
     
     def _format_results(self, api_response: dict, request: ProductSearchRequest) -> dict:
         """
@@ -314,23 +418,23 @@ class ProductSearcher:
         - Validate data types
         - Return consistent format
         """
-        results = {
+        # Extract results safely: limit to 3 before touching any of them
+        organic = (api_response.get('organic') or ())[:3]
+        
+        return {
             "product": request.product_name,
             "quantity": request.quantity,
             "unit": request.unit,
-            "search_results": []
-        }
-        
-        # Extract results safely
-        for result in api_response.get('organic', [])[:3]:  # Limit to 3
-            if 'title' in result and 'link' in result:
-                results['search_results'].append({
+            "search_results": [
+                {
                     'title': result['title'][:200],  # Truncate
                     'url': result['link'][:500],
-                    'snippet': result.get('snippet', '')[:300]
-                })
-        
-        return results
+                    'snippet': (result.get('snippet') or '')[:300]
+                }
+                for result in organic
+                if 'title' in result and 'link' in result
+            ]
+        }
     
     async def close(self):
         """Cleanup resources"""
@@ -352,10 +456,13 @@ class LawnAIMCPPhase1:
     
     def __init__(self, forecast_path: str = "output/forecast.json"):
         self.forecast_path = forecast_path
-        self.credentials = APICredentials()
         # base_dir is project root (parent of MCP directory)
         self.parser = ForecastParser("..")
-        self.searcher = ProductSearcher(self.credentials)
+        self.searcher = ProductSearcher(
+            get_serper_key(),
+            cache_dir=Path("../output/.serper_cache")
+        )
+        self.max_concurrent_searches = 10  # Searches in flight at once
     
     async def process_forecast(self) -> dict:
         """
@@ -366,9 +473,12 @@ class LawnAIMCPPhase1:
         4. Return shopping recommendations
         """
         try:
+            # Validate the request once at the boundary
+            request = ForecastRequest(forecast_file=self.forecast_path)
+            
             # Load and parse forecast
-            forecast = self.parser.read_forecast(self.forecast_path)
-            products = self.parser.extract_products(forecast)
+            forecast = self.parser.read_forecast(request.forecast_file)
+            products = self.parser.extract_products(forecast, request.limit_products)
             
             # Search each product
             shopping_list = {
@@ -377,23 +487,33 @@ class LawnAIMCPPhase1:
                 "errors": []
             }
             
-            for product in products:
-                try:
-                    search_request = ProductSearchRequest(
-                        product_name=product.name,
-                        quantity=product.volume,
-                        unit=product.unit
-                    )
-                    
-                    result = await self.searcher.search_product(search_request)
-                    shopping_list["products"].append(result)
-                
-                except Exception as e:
+            # Searches are network-bound: run them concurrently, bounded
+            semaphore = asyncio.Semaphore(self.max_concurrent_searches)
+            
+            async def search(product: Product) -> dict:
+                # Product fields were already checked by the parser
+                search_request = ProductSearchRequest.model_construct(
+                    product_name=product.name,
+                    quantity=product.volume,
+                    unit=product.unit
+                )
+                async with semaphore:
+                    return await self.searcher.search_product(search_request)
+            
+            results = await asyncio.gather(
+                *(search(product) for product in products),
+                return_exceptions=True
+            )
+            
+            for product, result in zip(products, results):
+                if isinstance(result, Exception):
                     # Log error but continue processing
                     shopping_list["errors"].append({
                         "product": product.name,
-                        "error": str(e)
+                        "error": str(result)
                     })
+                else:
+                    shopping_list["products"].append(result)
             
             return shopping_list
         
@@ -409,21 +529,20 @@ class LawnAIMCPPhase1:
 # QUICK TEST
 # ============================================================================
 if __name__ == "__main__":
-    import asyncio
-    
     async def test():
         try:
             server = LawnAIMCPPhase1()
             result = await server.process_forecast()
             
             # Print to stdout
-            print(json.dumps(result, indent=2))
+            output = orjson.dumps(result, option=orjson.OPT_INDENT_2)
+            print(output.decode())
             
             # Also save to output file
             output_file = Path("../output/mcp_search_results.json")
             output_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_file, 'w') as f:
-                json.dump(result, f, indent=2)
+            with open(output_file, 'wb') as f:
+                f.write(output)
             print(f"\n✓ Results saved to {output_file}", file=__import__('sys').stderr)
             
             await server.close()
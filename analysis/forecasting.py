@@ -1,5 +1,43 @@
-import numpy as np
-from datetime import datetime
+import re
+
+_MONTHS = (
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December"
+)
+
+# Product categories and their name keywords, checked in order: the first
+# category with a keyword anywhere in the product name wins
+_CATEGORY_KEYWORDS = (
+    ('Fertilizer', ['nitrogen', 'potash', 'phosphorus', 'sulfur', 'scu', 'ubm', 'iron']),
+    ('Weed Control', ['weed', 'manor', 'atrazine', 'certainty', 'herbicide', 'dicamba', 'mcpa', 'mecoprop', 'sulfosulfuron', 'prodiamine', 'indaziflam', 'halosulfuron', 'celsius', 'change up', 'barricade', 'specticle']),
+    ('Iron/Micronutrient', ['iron', 'spt iron']),
+    ('Sulfur', ['sulfur', 'dispersable']),
+    ('Insecticide', ['insect', 'talstar', 'bifenthrin', 'acelepryn', 'thiamethoxam', 'chlorantraniliprole']),
+    ('Surfactant', ['surfactant', 'non-ionic']),
+)
+
+# One compiled alternation per category: a single C-level scan replaces a
+# Python-level substring test per keyword
+_CATEGORY_PATTERNS = tuple(
+    (category, re.compile("|".join(map(re.escape, keywords))))
+    for category, keywords in _CATEGORY_KEYWORDS
+)
+
+
+def _is_iso_date(date_str):
+    """Cheap shape check for the parser's "YYYY-MM-DD" dates."""
+    month = date_str[5:7]
+    return len(date_str) >= 10 and date_str[4] == '-' and month.isdigit() and "01" <= month <= "12"
+
+
+def categorize_product(prod_name):
+    """Categorize product by name."""
+    prod_lower = prod_name.lower()
+    for category, pattern in _CATEGORY_PATTERNS:
+        if pattern.search(prod_lower):
+            return category
+    return 'Other'
+
 
 def forecast_next_year(records, trends):
     """
@@ -15,25 +53,28 @@ def forecast_next_year(records, trends):
             "notes": "latest note for that month"
         }
     """
-    # Group records by month to get historical usage patterns
+    # Group records by month to get historical usage patterns.
+    # Single pass, no sort: the latest note (and latest unit/targets per
+    # product) is kept by comparing ISO dates as we go.
     monthly_data = {}
-    
-    # Sort records by date to easily find the latest note
-    records.sort(key=lambda r: r.get("date", ""), reverse=True)
 
     for record in records:
         if not record.get("date"):
             continue
         
-        date_obj = datetime.fromisoformat(record["date"])
-        month_key = date_obj.strftime("%B")  # "January", "February", etc.
+        date_str = record["date"]
+        if not _is_iso_date(date_str):
+            continue
+        month_key = _MONTHS[int(date_str[5:7]) - 1]  # "January", "February", etc.
         
         if month_key not in monthly_data:
-            monthly_data[month_key] = {"products": {}, "notes": []}
+            monthly_data[month_key] = {"products": {}, "latest_note": "", "latest_date": ""}
+        month_data = monthly_data[month_key]
         
-        # Capture notes for the month
-        if record.get("notes"):
-            monthly_data[month_key]["notes"].append(record["notes"])
+        # Capture the latest note for the month
+        if record.get("notes") and date_str > month_data["latest_date"]:
+            month_data["latest_date"] = date_str
+            month_data["latest_note"] = record["notes"]
             
         # Accumulate product volumes and metadata by month
         if record.get("products"):
@@ -43,36 +84,37 @@ def forecast_next_year(records, trends):
                 unit = product.get("unit", "")
                 targets = product.get("targets", "")
                 
-                if prod_name not in monthly_data[month_key]["products"]:
-                    monthly_data[month_key]["products"][prod_name] = {
-                        "volumes": [],
+                if prod_name not in month_data["products"]:
+                    month_data["products"][prod_name] = {
+                        "vol_sum": 0.0,
+                        "vol_count": 0,
                         "unit": unit,
-                        "targets": targets
+                        "targets": targets,
+                        "date": date_str
                     }
                 
-                monthly_data[month_key]["products"][prod_name]["volumes"].append(applied_amt)
+                prod_totals = month_data["products"][prod_name]
+                if date_str > prod_totals["date"]:
+                    prod_totals["unit"] = unit
+                    prod_totals["targets"] = targets
+                    prod_totals["date"] = date_str
+                prod_totals["vol_sum"] += applied_amt
+                prod_totals["vol_count"] += 1
 
     # Create forecast for next 12 months using historical averages
-    month_names = [
-        "January", "February", "March", "April", "May", "June",
-        "July", "August", "September", "October", "November", "December"
-    ]
-    
     forecast = {}
-    for i, month_name in enumerate(month_names, 1):
+    for i, month_name in enumerate(_MONTHS, 1):
         month_key = f"Month_{i}"
         forecast[month_key] = {"products": {}, "notes": ""}
         
         if month_name in monthly_data:
             # Get the latest note for the month
-            if monthly_data[month_name]["notes"]:
-                forecast[month_key]["notes"] = monthly_data[month_name]["notes"][0]
+            forecast[month_key]["notes"] = monthly_data[month_name]["latest_note"]
 
             # Calculate average product usage
             for prod_name, prod_data in monthly_data[month_name]["products"].items():
-                volumes = prod_data["volumes"]
-                if volumes:
-                    avg_volume = np.mean(volumes)
+                if prod_data["vol_count"]:
+                    avg_volume = prod_data["vol_sum"] / prod_data["vol_count"]
                     forecast[month_key]["products"][prod_name] = {
                         "volume": round(avg_volume, 4),
                         "unit": prod_data.get("unit", ""),
@@ -87,52 +129,35 @@ def generate_historical_table(records, embeddings):
     Generate a historical data table showing product categories used each month.
     
     Args:
-        records: list of parsed receipt dicts with date, products, notes
-        embeddings: list of embedding vectors corresponding to notes
+        records: list of parsed receipt dicts with date, products, notes and
+            embedding_index (row of embeddings for the record's notes, or None)
+        embeddings: (N, D) array of embedding vectors corresponding to notes
     
     Returns:
         dict with historical data organized by month/date
     """
-    from datetime import datetime
-    
-    # Categorize products by type
-    def categorize_product(prod_name):
-        """Categorize product by name."""
-        prod_lower = prod_name.lower()
-        
-        if any(x in prod_lower for x in ['nitrogen', 'potash', 'phosphorus', 'sulfur', 'scu', 'ubm', 'iron']):
-            return 'Fertilizer'
-        elif any(x in prod_lower for x in ['weed', 'manor', 'atrazine', 'certainty', 'herbicide', 'dicamba', 'mcpa', 'mecoprop', 'sulfosulfuron', 'prodiamine', 'indaziflam', 'halosulfuron', 'celsius', 'change up', 'barricade', 'specticle']):
-            return 'Weed Control'
-        elif any(x in prod_lower for x in ['iron', 'spt iron']):
-            return 'Iron/Micronutrient'
-        elif any(x in prod_lower for x in ['sulfur', 'dispersable']):
-            return 'Sulfur'
-        elif any(x in prod_lower for x in ['insect', 'talstar', 'bifenthrin', 'acelepryn', 'thiamethoxam', 'chlorantraniliprole']):
-            return 'Insecticide'
-        elif any(x in prod_lower for x in ['surfactant', 'non-ionic']):
-            return 'Surfactant'
-        else:
-            return 'Other'
+    # Newest first, so each month's date, notes and embedding come from its
+    # latest receipt regardless of the order the receipts were loaded in
+    # (filename breaks ties between receipts from the same day)
+    dated = [
+        record for record in records
+        if record.get("date") and _is_iso_date(record["date"])
+    ]
+    dated.sort(key=lambda r: (r["date"], r.get("filename", "")), reverse=True)
     
     # Group by date
     historical = {}
-    embedding_idx = 0
     
-    for record in records:
-        if not record.get("date"):
-            continue
-        
+    for record in dated:
         date_str = record["date"]
-        date_obj = datetime.fromisoformat(date_str)
-        month_str = date_obj.strftime("%Y-%m")
+        month_str = date_str[:7]
         
         if month_str not in historical:
             # Get embedding for this month's notes if available
             embedding_vector = None
-            if record.get("notes") and record.get("notes").strip() and embedding_idx < len(embeddings):
-                embedding_vector = embeddings[embedding_idx]
-                embedding_idx += 1
+            embedding_index = record.get("embedding_index")
+            if embedding_index is not None and embedding_index < len(embeddings):
+                embedding_vector = embeddings[embedding_index].tolist()
             
             historical[month_str] = {
                 "date": date_str,
@@ -140,7 +165,7 @@ def generate_historical_table(records, embeddings):
                 "product_categories": {},
                 "notes": record.get("notes", ""),
                 "embedding": embedding_vector,
-                "embedding_summary": f"[{len(embedding_vector)} dims]" if embedding_vector else "N/A",
+                "embedding_summary": f"[{len(embedding_vector)} dims]" if embedding_vector is not None else "N/A",
                 "volume_total": 0.0
             }
         
@@ -204,15 +229,15 @@ def generate_historical_table(records, embeddings):
         "embeddings": {
             month_key: {
                 "embedding": month_data["embedding"],
-                "embedding_shape": f"{len(month_data['embedding'])} dimensions" if month_data["embedding"] else "N/A"
+                "embedding_shape": f"{len(month_data['embedding'])} dimensions" if month_data["embedding"] is not None else "N/A"
             }
             for month_key, month_data in sorted_historical.items()
-            if month_data["embedding"]
+            if month_data["embedding"] is not None
         },
         "summary": {
             "total_records": len(sorted_historical),
             "date_range": f"{min(sorted_historical.keys())} to {max(sorted_historical.keys())}",
-            "embedding_dimension": len(embeddings[0]) if embeddings else 0
+            "embedding_dimension": len(embeddings[0]) if len(embeddings) else 0
         }
     }
     
@@ -1,20 +1,27 @@
 import numpy as np
-from collections import defaultdict
 from datetime import datetime
 
 def compute_trends(records, embeddings):
     # Example: monthly embedding centroid
-    monthly = defaultdict(list)
+    # Month ("YYYY-MM") of each embedding's record; zip semantics pair the
+    # first len(embeddings) records with the embeddings
+    n = min(len(records), len(embeddings))
+    months = [rec["date"][:7] if rec["date"] is not None else None for rec in records[:n]]
+    keep = [i for i, month in enumerate(months) if month is not None]
+    if not keep:
+        return {}
 
-    for rec, emb in zip(records, embeddings):
-        if rec["date"] is None:
-            continue
-        month = rec["date"][:7]  # "YYYY-MM"
-        monthly[month].append(np.array(emb))
+    # One (N, D) array, then per-month sums and counts in single reductions
+    emb_arr = np.asarray(embeddings[:n], dtype=np.float64)[keep]
+    uniq, inv = np.unique([months[i] for i in keep], return_inverse=True)
+    sums = np.zeros((len(uniq), emb_arr.shape[1]), dtype=np.float64)
+    np.add.at(sums, inv, emb_arr)
+    counts = np.bincount(inv, minlength=len(uniq))
+    centroids = sums / counts[:, None]
 
     monthly_trends = {
-        month: np.mean(vectors, axis=0).tolist()
-        for month, vectors in monthly.items()
+        str(month): centroids[i].tolist()
+        for i, month in enumerate(uniq)
     }
 
     return monthly_trends
@@ -9,39 +9,13 @@ This script integrates:
 
 import json
 import os
+from html import escape
 from pathlib import Path
 from datetime import datetime
 
-def load_forecast():
-    """Load forecast.json"""
-    with open("output/forecast.json", "r") as f:
-        return json.load(f)
-
-def load_mcp_results():
-    """Load MCP search results"""
-    try:
-        with open("output/mcp_search_results.json", "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {"products": [], "errors": []}
-
-def create_shopping_references(mcp_results):
-    """Create a lookup dict of product name -> shopping options"""
-    shopping = {}
-    for product_info in mcp_results.get("products", []):
-        product_name = product_info.get("product", "")
-        search_results = product_info.get("search_results", [])
-        shopping[product_name] = {
-            "quantity": product_info.get("quantity", 0),
-            "unit": product_info.get("unit", ""),
-            "results": search_results
-        }
-    return shopping
-
-def generate_html_report(forecast, shopping):
-    """Generate comprehensive HTML report"""
-    
-    html = """<!DOCTYPE html>
+# Static page chrome, built once at import rather than on every report.
+# The generation timestamps are spliced in between the two halves.
+_HEAD_HTML = """<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
@@ -337,16 +311,84 @@ def generate_html_report(forecast, shopping):
         </div>
         
         <div class="timestamp">
-            Generated on """ + datetime.now().strftime("%B %d, %Y at %I:%M %p") + """
+            Generated on """
+
+_HEAD_HTML_END = """
         </div>
 """
+
+_FOOTER_HTML = """
+        </div>
+        
+        <div class="footer">
+            <p>💡 <strong>Pro Tip:</strong> Save this page as PDF (Print → Save as PDF) for a portable reference guide.</p>
+            <p>Last updated: """
+
+_FOOTER_HTML_END = """</p>
+            <p>Powered by Lawn-AI Forecasting + MCP Shopping Discovery</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+_MONTH_NAMES = (
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December"
+)
+
+def safe_url(url):
+    """Only http(s) links from search results become hrefs; anything else
+    (javascript:, data:, ...) falls back to "#"."""
+    if isinstance(url, str):
+        url = url.strip()
+        if url.lower().startswith(("http://", "https://")):
+            return url
+    return "#"
+
+def load_forecast():
+    """Load forecast.json"""
+    with open("output/forecast.json", "r") as f:
+        return json.load(f)
+
+def load_mcp_results():
+    """Load MCP search results"""
+    try:
+        with open("output/mcp_search_results.json", "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"products": [], "errors": []}
+
+def create_shopping_references(mcp_results):
+    """Create a lookup dict of product name -> shopping options"""
+    shopping = {}
+    for product_info in mcp_results.get("products", []):
+        get = product_info.get
+        shopping[get("product", "")] = {
+            "quantity": get("quantity", 0),
+            "unit": get("unit", ""),
+            "results": get("search_results", [])
+        }
+    return shopping
+
+def generate_html_report(forecast, shopping):
+    """Generate comprehensive HTML report"""
+    
+    # Collect fragments and join once at the end; repeated str += would
+    # copy the whole growing report on every append
+    parts = [_HEAD_HTML, datetime.now().strftime("%B %d, %Y at %I:%M %p"), _HEAD_HTML_END]
     
-    # Add summary
-    total_months = len(forecast)
-    total_products = sum(len(month.get("products", [])) for month in forecast.values())
+    # Add summary. One pass over the forecast pulls out each month's products,
+    # and the month sections below reuse it instead of walking forecast again
+    per_month = [
+        (month_data, month_data.get("products") or {})
+        for month_data in forecast.values()
+    ]
+    total_months = len(per_month)
+    total_products = sum(len(products) for _, products in per_month)
     total_shopping = len(shopping)
     
-    html += f"""
+    parts.append(f"""
         <div class="content">
             <div class="summary-box">
                 <h3>📊 Overview</h3>
@@ -365,20 +407,15 @@ def generate_html_report(forecast, shopping):
                     </div>
                 </div>
             </div>
-"""
+""")
     
-    # Month names
-    month_names = [
-        "January", "February", "March", "April", "May", "June",
-        "July", "August", "September", "October", "November", "December"
-    ]
-    
-    # Generate month sections
-    for i, (month_key, month_data) in enumerate(forecast.items()):
+    # Generate month sections. Product names, targets, notes and search
+    # results come from receipts and the web, so they are HTML-escaped
+    for i, (month_data, products) in enumerate(per_month):
         month_num = i + 1
-        month_name = month_names[i] if i < 12 else f"Month {month_num}"
+        month_name = _MONTH_NAMES[i] if i < 12 else f"Month {month_num}"
         
-        html += f"""
+        parts.append(f"""
         <div class="month-section">
             <div class="month-header">
                 <span>{month_name}</span>
@@ -395,98 +432,91 @@ def generate_html_report(forecast, shopping):
                         </tr>
                     </thead>
                     <tbody>
-"""
+""")
         
-        products = month_data.get("products", {})
         notes = month_data.get("notes", "")
         
         if not products:
-            html += "<tr><td colspan='4' style='text-align:center; color:#999;'>No treatments scheduled</td></tr>"
+            parts.append("<tr><td colspan='4' style='text-align:center; color:#999;'>No treatments scheduled</td></tr>")
         
         for product_name, product_info in products.items():
-            volume = product_info.get("volume", 0)
-            unit = product_info.get("unit", "")
-            targets = product_info.get("targets", "")
+            get = product_info.get
+            volume = get("volume", 0)
+            unit = get("unit", "")
+            targets = get("targets", "")
             
-            html += f"""
+            parts.append(f"""
                         <tr>
-                            <td class="product-name">{product_name}</td>
+                            <td class="product-name">{escape(product_name)}</td>
                             <td>{volume}</td>
-                            <td>{unit}</td>
-                            <td>{targets}</td>
+                            <td>{escape(unit)}</td>
+                            <td>{escape(targets)}</td>
                         </tr>
-"""
+""")
             
             # Add shopping recommendations if available
-            if product_name in shopping:
-                shop_info = shopping[product_name]
-                results = shop_info.get("results", [])
+            shop_info = shopping.get(product_name)
+            if shop_info is not None:
+                results = shop_info["results"]
                 
-                html += f"""
+                parts.append(f"""
                         <tr>
                             <td colspan="4">
                                 <div class="shopping-section">
                                     <h4>🛒 Where to Buy</h4>
                                     <div class="shopping-results">
-"""
+""")
                 
-                if results:
-                    for result in results[:3]:  # Show top 3 results
+                top_results = results[:3]  # Show top 3 results
+                if top_results:
+                    for result in top_results:
                         title = result.get("title", "Unknown")
                         url = result.get("url", "#")
                         snippet = result.get("snippet", "")
                         
-                        html += f"""
+                        parts.append(f"""
                                         <div class="shopping-option">
-                                            <div class="shopping-option-title">{title}</div>
-                                            <div class="shopping-option-snippet">{snippet}</div>
-                                            <a href="{url}" target="_blank" class="shopping-option-link">View Product →</a>
+                                            <div class="shopping-option-title">{escape(title)}</div>
+                                            <div class="shopping-option-snippet">{escape(snippet)}</div>
+                                            <a href="{escape(safe_url(url))}" target="_blank" class="shopping-option-link">View Product →</a>
                                         </div>
-"""
+""")
                 else:
-                    html += """
+                    parts.append("""
                                         <div class="no-shopping">No shopping results found. Try searching manually.</div>
-"""
+""")
                 
-                html += """
+                parts.append("""
                                     </div>
                                 </div>
                             </td>
                         </tr>
-"""
+""")
         
-        html += """
+        parts.append("""
                     </tbody>
                 </table>
-"""
+""")
         
         if notes:
-            html += f"""
+            notes_trunc = escape(notes) if len(notes) <= 500 else escape(notes[:500]) + "..."
+            parts.append(f"""
                 <div class="notes">
                     <strong>📝 Notes from Treatment History:</strong><br>
-                    {notes[:500]}{'...' if len(notes) > 500 else ''}
+                    {notes_trunc}
                 </div>
-"""
+""")
         
-        html += """
+        parts.append("""
             </div>
         </div>
-"""
+""")
     
-    html += """
-        </div>
-        
-        <div class="footer">
-            <p>💡 <strong>Pro Tip:</strong> Save this page as PDF (Print → Save as PDF) for a portable reference guide.</p>
-            <p>Last updated: """ + datetime.now().strftime("%B %d, %Y") + """</p>
-            <p>Powered by Lawn-AI Forecasting + MCP Shopping Discovery</p>
-        </div>
-    </div>
-</body>
-</html>
-"""
+    parts.append(_FOOTER_HTML)
+    parts.append(datetime.now().strftime("%B %d, %Y"))
+    parts.append(_FOOTER_HTML_END)
     
-    return html
+    return "".join(parts)
 
 def main():
     print("📊 Generating combined forecast & shopping report...")
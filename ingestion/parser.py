@@ -1,6 +1,42 @@
 import re
+from bisect import bisect_left
 from datetime import datetime
 
+# Patterns compiled once at import, with their flags baked in
+_NOTES_RE = re.compile(
+    r"WHAT I DID AND WHAT TO EXPECT\s*(.*?)\n\s*PRODUCTS APPLIED",
+    re.DOTALL | re.IGNORECASE
+)
+_SQFT_RE = re.compile(r"(\d{3,5})\s*sqft", re.IGNORECASE)
+_METHOD_RE = re.compile(r"METHOD:\s*(.*?)\n", re.IGNORECASE)
+_AREAS_RE = re.compile(r"AREAS:\s*(.*?)\n", re.IGNORECASE)
+_DATE_RE = re.compile(r"(\d{1,2}/\d{1,2}/\d{4})")
+_APPLIED_RE = re.compile(
+    r"APPLIED AMT:\s*\n?\s*([\d\.]+)\s+(FLOZ|OZ|GAL|LB)(?:\s|/)",
+    re.IGNORECASE
+)
+_NONSPACE_RE = re.compile(r"\S")
+
+# Section markers: a TARGETS: value runs until the next of any other marker
+_SECTION_RE = re.compile(
+    r"TARGETS:|RATE:|PRODUCTS:|METHOD:|WHAT I|APPLIED AMT:",
+    re.IGNORECASE
+)
+
+def _last_nonblank_line(text, start, end):
+    """
+    Returns the last non-blank line of text[start:end], stripped, or None.
+    Walks backwards with bounded rfind instead of slicing and splitting.
+    """
+    while True:
+        newline = text.rfind("\n", start, end)
+        line_start = newline + 1 if newline != -1 else start
+        if _NONSPACE_RE.search(text, line_start, end):
+            return text[line_start:end].strip()
+        if newline == -1:
+            return None
+        end = newline
+
 def parse_receipt(pdf):
     text = pdf["text"]
     parsed = {
@@ -17,35 +53,32 @@ def parse_receipt(pdf):
     # --------------------------
     # Extract notes
     # --------------------------
-    notes_match = re.search(
-        r"WHAT I DID AND WHAT TO EXPECT\s*(.*?)\n\s*PRODUCTS APPLIED", 
-        text, re.DOTALL | re.IGNORECASE
-    )
+    notes_match = _NOTES_RE.search(text)
     if notes_match:
         parsed["notes"] = notes_match.group(1).strip()
 
     # --------------------------
     # Extract property SQFT
     # --------------------------
-    sqft_match = re.search(r"(\d{3,5})\s*sqft", text, re.IGNORECASE)
+    sqft_match = _SQFT_RE.search(text)
     if sqft_match:
         parsed["property_sqft"] = int(sqft_match.group(1))
 
     # --------------------------
     # Extract method / areas
     # --------------------------
-    method_match = re.search(r"METHOD:\s*(.*?)\n", text, re.IGNORECASE)
+    method_match = _METHOD_RE.search(text)
     if method_match:
         parsed["method"] = method_match.group(1).strip()
 
-    areas_match = re.search(r"AREAS:\s*(.*?)\n", text, re.IGNORECASE)
+    areas_match = _AREAS_RE.search(text)
     if areas_match:
         parsed["areas"] = areas_match.group(1).strip()
 
     # --------------------------
     # Extract service date
     # --------------------------
-    date_match = re.search(r"(\d{1,2}/\d{1,2}/\d{4})", text)
+    date_match = _DATE_RE.search(text)
     if date_match:
         try:
             parsed["date"] = datetime.strptime(date_match.group(1), "%m/%d/%Y").date().isoformat()
@@ -64,11 +97,23 @@ def parse_receipt(pdf):
     
     # Find all "APPLIED AMT:" entries in the entire document
     # This is more robust than looking for PRODUCTS: sections
-    applied_matches = list(re.finditer(
-        r"APPLIED AMT:\s*\n?\s*([\d\.]+)\s+(FLOZ|OZ|GAL|LB)(?:\s|/)",
-        text,
-        re.IGNORECASE
-    ))
+    applied_matches = list(_APPLIED_RE.finditer(text))
+    
+    # Tokenize the section markers in one pass, in document order, so each
+    # product's RATE: and TARGETS: are found by binary search rather than by
+    # re-scanning the text before and after every APPLIED AMT
+    rate_starts = []     # "RATE:" exactly; product names sit just above it
+    target_starts = []
+    target_ends = []
+    stop_starts = []     # markers that end a TARGETS: value
+    for marker in _SECTION_RE.finditer(text):
+        if marker.group().upper() == "TARGETS:":
+            target_starts.append(marker.start())
+            target_ends.append(marker.end())
+        else:
+            stop_starts.append(marker.start())
+            if marker.group() == "RATE:":
+                rate_starts.append(marker.start())
     
     for i, applied_match in enumerate(applied_matches):
         amt_value = float(applied_match.group(1))
@@ -78,14 +123,6 @@ def parse_receipt(pdf):
         if amt_unit == "FLOZ":
             amt_unit = "OZ"
         
-        # Find the product name by looking backwards from this APPLIED AMT
-        text_before = text[:applied_match.start()]
-        
-        # Find the last "RATE:" before this APPLIED AMT
-        rate_pos = text_before.rfind("RATE:")
-        if rate_pos == -1:
-            continue
-        
         # Get text between previous APPLIED AMT (if exists) and current RATE:
         if i > 0:
             prev_applied = applied_matches[i - 1]
@@ -93,30 +130,41 @@ def parse_receipt(pdf):
         else:
             search_start = 0
         
-        product_text = text[search_start:rate_pos].strip()
+        # Find the last "RATE:" before this APPLIED AMT; one before the
+        # previous APPLIED AMT belongs to another product
+        rate_idx = bisect_left(rate_starts, applied_match.start()) - 1
+        if rate_idx < 0 or rate_starts[rate_idx] < search_start:
+            continue
+        rate_pos = rate_starts[rate_idx]
         
-        # Extract product name from this text
+        # Extract product name from the text between search_start and RATE:
         # It should be the last non-empty line
-        lines = [line.strip() for line in product_text.split('\n') if line.strip()]
-        if lines:
-            prod_name = lines[-1]  # Last line is typically the product name
-        else:
+        prod_name = _last_nonblank_line(text, search_start, rate_pos)
+        if prod_name is None:
             continue
         
         # Extract targets/classification from the text after APPLIED AMT
         # Look for "TARGETS:" after this product's APPLIED AMT line
-        text_after = text[applied_match.end():]
-        targets_match = re.search(
-            r"TARGETS:\s*(.*?)(?=RATE:|PRODUCTS:|METHOD:|WHAT I|APPLIED AMT:|$)",
-            text_after,
-            re.IGNORECASE | re.DOTALL
-        )
+        target_idx = bisect_left(target_starts, applied_match.end())
         
         targets = ""
-        if targets_match:
-            targets_text = targets_match.group(1).strip()
-            # Clean up the targets text - take first 100 chars or first item
-            targets = targets_text.split('\n')[0][:100] if targets_text else ""
+        if target_idx < len(target_starts):
+            value_start = target_ends[target_idx]
+            stop_idx = bisect_left(stop_starts, value_start)
+            value_end = stop_starts[stop_idx] if stop_idx < len(stop_starts) else len(text)
+            # Clean up the targets text - take first 100 chars of the first
+            # line, copying only that line rather than the whole value
+            first = _NONSPACE_RE.search(text, value_start, value_end)
+            if first:
+                line_start = first.start()
+                line_end = text.find("\n", line_start, value_end)
+                if line_end == -1:
+                    line_end = value_end
+                targets = text[line_start:line_end]
+                if not _NONSPACE_RE.search(text, line_end, value_end):
+                    # Last line of the value, so its trailing space goes too
+                    targets = targets.rstrip()
+                targets = targets[:100]
         
         prod = {
             "name": prod_name,
@@ -1,30 +1,55 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF
 
+# The flags get_text("text") uses by default, minus ligature preservation, so
+# "ﬁ"/"ﬂ" come out as plain letters the receipt regexes can match
+_TEXT_FLAGS = fitz.TEXTFLAGS_TEXT & ~fitz.TEXT_PRESERVE_LIGATURES
+
+def _page_text(page):
+    """Extracts a page's plain text from a single TextPage."""
+    textpage = page.get_textpage(flags=_TEXT_FLAGS)
+    text = textpage.extractText()
+    del textpage  # release the MuPDF text page before the next page loads
+    return text
+
+def _load_one(path):
+    """
+    Extracts the text of a single PDF. Runs in a worker process, so it
+    stays at module level (picklable) and returns None instead of raising.
+    """
+    fname = os.path.basename(path)
+
+    try:
+        with fitz.open(path) as doc:
+            doc_text = "\n".join(_page_text(page) for page in doc)
+    except Exception as e:
+        print(f"⚠️ Error reading {fname}: {e}")
+        return None
+
+    return {
+        "filename": fname,
+        "text": doc_text.strip()
+    }
+
 def load_pdfs(pdf_dir):
     """
     Loads PDFs from a directory and returns a list of dicts:
     [{ "filename": str, "text": str }]
     """
-    pdf_texts = []
-
-    for fname in os.listdir(pdf_dir):
-        if not fname.lower().endswith(".pdf"):
-            continue
-        path = os.path.join(pdf_dir, fname)
-        doc_text = ""
-
-        try:
-            with fitz.open(path) as doc:
-                for page in doc:
-                    doc_text += page.get_text("text") + "\n"
-        except Exception as e:
-            print(f"⚠️ Error reading {fname}: {e}")
-            continue
-
-        pdf_texts.append({
-            "filename": fname,
-            "text": doc_text.strip()
-        })
+    with os.scandir(pdf_dir) as entries:
+        paths = [
+            entry.path
+            for entry in entries
+            if entry.name.lower().endswith(".pdf") and entry.is_file()
+        ]
+    if not paths:
+        return []
+
+    # Text extraction is CPU-bound and independent per file. Processes rather
+    # than threads: PyMuPDF is not thread-safe across documents
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(_load_one, paths)
+        pdf_texts = [result for result in results if result is not None]
 
     return pdf_texts
@@ -1,23 +1,51 @@
 import argparse
-import json
 import os
+import numpy as np
+import orjson
 from ingestion.pdf_loader import load_pdfs
 from ingestion.parser import parse_receipt
 from models.embeddings import embed_texts
 from analysis.trend_model import compute_trends
 from analysis.forecasting import forecast_next_year, generate_historical_table
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument(
-        "--pdf_dir",
-        type=str,
-        required=True,
-        default="data/receipts",
-        help="Path to directory containing PDF receipts"
-    )
-    args = parser.parse_args()
-    pdf_dir = args.pdf_dir
+EMBED_MODEL = "nomic-embed-text"
+PIPELINE_STATE = "output/.pipeline_state.json"  # input fingerprint of the last run
+
+def _write_json(path, obj):
+    """Write obj as 2-space indented JSON; numpy arrays serialize natively."""
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+
+def _pipeline_state(pdf_dir, model):
+    """
+    Fingerprint of the pipeline's inputs: the (mtime, size) of every receipt
+    PDF plus the embedding model. If it matches the last run, the parsed
+    receipts and their embeddings on disk are still current.
+    """
+    receipts = {}
+    with os.scandir(pdf_dir) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(".pdf") and entry.is_file():
+                stat = entry.stat()
+                receipts[entry.name] = [stat.st_mtime_ns, stat.st_size]
+    return {"pdf_dir": os.path.abspath(pdf_dir), "model": model, "receipts": receipts}
+
+def _load_pipeline_state():
+    try:
+        with open(PIPELINE_STATE, "rb") as f:
+            return orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+
+def _ingest(pdf_dir, model):
+    """Steps 1-3: load and parse the receipts, then embed their notes."""
+    # data/processed.json is rewritten before Ollama is called, so drop the
+    # saved state first: if embedding fails, the next run must not pair the
+    # new receipts with the previous run's embeddings.npz
+    try:
+        os.remove(PIPELINE_STATE)
+    except FileNotFoundError:
+        pass
 
     print(f"[1] Loading PDFs from: {pdf_dir}")
     pdf_texts = load_pdfs(pdf_dir)
@@ -45,30 +73,72 @@ def main():
         if p["date"] is None:
             print(f"⚠️ No date captured in {p['filename']}")
 
-    # Ensure directories exist
-    os.makedirs("data", exist_ok=True)
-    os.makedirs("output", exist_ok=True)
+    # Point parsed entries at their row of the (N, D) embeddings array;
+    # the rows follow the order of non-empty notes, so this is known before
+    # embedding and the vectors themselves go to an .npz, not the JSON
+    notes_to_embed = []
+    embedded_filenames = []
+    for p in parsed:
+        if p["notes"].strip():
+            p["embedding_index"] = len(notes_to_embed)
+            notes_to_embed.append(p["notes"])
+            embedded_filenames.append(p["filename"])
+        else:
+            p["embedding_index"] = None
 
-    # Save parsed receipts
-    with open("data/processed.json", "w") as f:
-        json.dump(parsed, f, indent=2)
+    # Save parsed receipts (once; written before embedding so they survive
+    # an unreachable Ollama server)
+    _write_json("data/processed.json", parsed)
 
     print(f"[3] Generating embeddings (Ollama)...")
-    notes_to_embed = [p["notes"] for p in parsed if p["notes"].strip()]
-    embeddings = embed_texts(notes_to_embed)
+    embeddings = embed_texts(notes_to_embed, model=model)
 
-    # Attach embeddings to parsed entries
-    emb_index = 0
-    for p in parsed:
-        if p["notes"].strip():
-            p["embedding"] = embeddings[emb_index]
-            emb_index += 1
-        else:
-            p["embedding"] = []
+    np.savez_compressed(
+        "output/embeddings.npz",
+        emb=embeddings,
+        filenames=np.array(embedded_filenames)
+    )
+
+    return parsed, embeddings
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--pdf_dir",
+        type=str,
+        required=True,
+        default="data/receipts",
+        help="Path to directory containing PDF receipts"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-run PDF loading, parsing and embedding even if no receipt changed"
+    )
+    args = parser.parse_args()
+    pdf_dir = args.pdf_dir
+
+    # Ensure directories exist
+    os.makedirs("data", exist_ok=True)
+    os.makedirs("output", exist_ok=True)
 
-    # Save with embeddings
-    with open("processed.json", "w") as f:
-        json.dump(parsed, f, indent=2)
+    # Unchanged receipts parse and embed to the same result, so reuse the
+    # previous run's output instead of re-reading every PDF and calling Ollama
+    state = _pipeline_state(pdf_dir, EMBED_MODEL)
+    if (
+        not args.force
+        and _load_pipeline_state() == state
+        and os.path.exists("data/processed.json")
+        and os.path.exists("output/embeddings.npz")
+    ):
+        print(f"[1-3] Receipts in {pdf_dir} unchanged; reusing data/processed.json and output/embeddings.npz")
+        with open("data/processed.json", "rb") as f:
+            parsed = orjson.loads(f.read())
+        with np.load("output/embeddings.npz") as npz:
+            embeddings = npz["emb"]
+    else:
+        parsed, embeddings = _ingest(pdf_dir, EMBED_MODEL)
+        _write_json(PIPELINE_STATE, state)
 
     print("[4] Computing trends...")
     trends = compute_trends(parsed, embeddings)
@@ -77,26 +147,26 @@ def main():
     forecast = forecast_next_year(parsed, trends)
     
     # Save forecast
-    with open("output/forecast.json", "w") as f:
-        json.dump(forecast, f, indent=2)
+    _write_json("output/forecast.json", forecast)
 
     # Generate historical data table
     print("[6] Generating historical data table...")
     historical_table = generate_historical_table(parsed, embeddings)
     
     # Save historical data
-    with open("output/historical_data.json", "w") as f:
-        json.dump(historical_table, f, indent=2)
+    _write_json("output/historical_data.json", historical_table)
     
     # Also save as CSV for Excel
     import csv
     if historical_table["table"]:
         csv_file = "output/historical_data.csv"
-        fieldnames = historical_table["table"][0].keys()
-        with open(csv_file, "w", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(historical_table["table"])
+        # Every row carries the same columns (one per category seen), so rows
+        # are written as plain lists rather than through DictWriter
+        fieldnames = list(historical_table["table"][0])
+        with open(csv_file, "w", newline="", buffering=1024 * 1024) as f:
+            writer = csv.writer(f)
+            writer.writerow(fieldnames)
+            writer.writerows([row[field] for field in fieldnames] for row in historical_table["table"])
         print(f"   Saved CSV to {csv_file}")
 
     print("\nDone! Check output/forecast.json and output/historical_data.json")
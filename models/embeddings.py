@@ -1,30 +1,120 @@
-import subprocess
-import ast
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 
-def embed_texts(text_list, model="nomic-embed-text"):
-    embeddings = []
+import httpx
+import numpy as np
 
-    for text in text_list:
-        clean = (text or "").strip()
+OLLAMA_URL = "http://localhost:11434"
+BATCH_SIZE = 16  # texts per /api/embed request
+MAX_WORKERS = 8  # requests in flight at once
+CACHE_PATH = "output/.embed_cache.sqlite"  # embeddings from earlier runs
+EMPTY_DIM = 768  # width used when no text was embedded (nomic-embed-text)
 
-        if not clean:
-            embeddings.append([0.0] * 768)
+def _to_array(embeddings):
+    # One (N, D) float16 block: ample precision for cosine similarity at a
+    # fraction of the memory of N lists of Python floats. D comes from the
+    # model's vectors; empty texts (None) are zero rows of the same width
+    dim = next((len(vector) for vector in embeddings if vector is not None), EMPTY_DIM)
+    array = np.zeros((len(embeddings), dim), dtype=np.float16)
+    for i, vector in enumerate(embeddings):
+        if vector is None:
             continue
+        if len(vector) != dim:
+            raise RuntimeError(
+                f"Embedding {i} has {len(vector)} dimensions, expected {dim}"
+            )
+        array[i] = vector
+    return array
+
+def _cache_key(model, text):
+    return hashlib.sha256((model + "\0" + text).encode()).hexdigest()
+
+def _open_cache(cache_path):
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    db = sqlite3.connect(cache_path)
+    db.execute("CREATE TABLE IF NOT EXISTS emb (key TEXT PRIMARY KEY, vec BLOB)")
+    return db
 
-        result = subprocess.run(
-            ["ollama", "run", model, clean],
-            text=True,
-            capture_output=True
+def _embed_batch(client, model, texts):
+    try:
+        response = client.post("/api/embed", json={"model": model, "input": texts})
+    except httpx.HTTPError as e:
+        raise RuntimeError(f"Could not reach Ollama at {OLLAMA_URL}: {e}")
+
+    if response.status_code != 200:
+        raise RuntimeError(
+            f"Ollama returned no embedding. HTTP {response.status_code}:\n{response.text}"
         )
 
-        raw = result.stdout.strip()
-        if not raw:
-            raise RuntimeError(
-                f"Ollama returned no embedding. STDERR:\n{result.stderr}"
-            )
+    vectors = response.json().get("embeddings") or []
+    if len(vectors) != len(texts):
+        raise RuntimeError(
+            f"Ollama returned {len(vectors)} embeddings for {len(texts)} texts"
+        )
+    return vectors
 
-        # ⚡ Parse Python-style list
-        embedding = ast.literal_eval(raw)
-        embeddings.append(embedding)
+def embed_texts(text_list, model="nomic-embed-text", cache_path=CACHE_PATH):
+    embeddings = [None] * len(text_list)
+
+    # Empty texts get a zero vector (filled in by _to_array); the rest are
+    # embedded in batches, remembering their position so the output order
+    # matches the input
+    nonempty = []
+    for i, text in enumerate(text_list):
+        clean = (text or "").strip()
+        if clean:
+            nonempty.append((i, clean))
+
+    if not nonempty:
+        return _to_array(embeddings)
+
+    # Texts embedded by an earlier run with the same model come from the
+    # on-disk cache (content-addressed, stored as float32 bytes)
+    db = _open_cache(cache_path) if cache_path else None
+    try:
+        if db is not None:
+            missing = []
+            for i, text in nonempty:
+                row = db.execute(
+                    "SELECT vec FROM emb WHERE key = ?", (_cache_key(model, text),)
+                ).fetchone()
+                if row:
+                    embeddings[i] = np.frombuffer(row[0], dtype=np.float32)
+                else:
+                    missing.append((i, text))
+            nonempty = missing
+
+        if not nonempty:
+            return _to_array(embeddings)
+
+        batches = [nonempty[start:start + BATCH_SIZE] for start in range(0, len(nonempty), BATCH_SIZE)]
+
+        # Requests are I/O-bound, so a few threads share one pooled client and
+        # keep the Ollama server busy while others wait on the network
+        limits = httpx.Limits(max_connections=MAX_WORKERS, max_keepalive_connections=MAX_WORKERS)
+        with httpx.Client(base_url=OLLAMA_URL, timeout=120.0, limits=limits) as client:
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                results = executor.map(
+                    lambda batch: _embed_batch(client, model, [text for _, text in batch]),
+                    batches
+                )
+                for batch, vectors in zip(batches, results):
+                    for (i, _), vector in zip(batch, vectors):
+                        embeddings[i] = vector
+
+        if db is not None:
+            db.executemany(
+                "INSERT OR REPLACE INTO emb (key, vec) VALUES (?, ?)",
+                [
+                    (_cache_key(model, text), np.asarray(embeddings[i], dtype=np.float32).tobytes())
+                    for i, text in nonempty
+                ]
+            )
+            db.commit()
+    finally:
+        if db is not None:
+            db.close()
 
-    return embeddings
+    return _to_array(embeddings)